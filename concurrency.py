@@ -0,0 +1,112 @@
+import logging
+import threading
+from time import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_threshold: float,
+        decrease_factor: float = 0.5,
+    ):
+        self._name = name
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._latency_threshold = latency_threshold
+        self._decrease_factor = decrease_factor
+
+        self._limit: int = max(min_limit, min(initial_limit, max_limit))
+        self._in_flight: int = 0
+        self._successes: int = 0
+        self._failures: int = 0
+        self._healthy_in_window: int = 0
+        self._last_decrease: float = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def metrics(self) -> dict:
+        with self._condition:
+            return {
+                "name": self._name,
+                "limit": self._limit,
+                "in_flight": self._in_flight,
+                "successes": self._successes,
+                "failures": self._failures,
+            }
+
+    def acquire(self) -> float:
+        with self._condition:
+            while self._in_flight >= self._limit:
+                self._condition.wait()
+
+            self._in_flight += 1
+
+        return time()
+
+    def release(self, start_time: float, failed: bool = False):
+        latency = time() - start_time
+
+        with self._condition:
+            self._in_flight -= 1
+
+            if failed:
+                self._failures += 1
+            else:
+                self._successes += 1
+
+            if failed or latency > self._latency_threshold:
+                self._decrease(start_time, latency, failed)
+
+            else:
+                self._increase()
+
+            self._condition.notify_all()
+
+    def discard(self):
+        # Frees the slot of a request that was not sent, without adapting the limit
+        with self._condition:
+            self._in_flight -= 1
+
+            self._condition.notify_all()
+
+    def _increase(self):
+        # Additive increase, one slot per full window of healthy responses
+        self._healthy_in_window += 1
+
+        if self._healthy_in_window >= self._limit and self._limit < self._max_limit:
+            self._healthy_in_window = 0
+            self._limit += 1
+
+            _LOGGER.debug(
+                f"Concurrency limit of {self._name} increased to {self._limit}"
+            )
+
+    def _decrease(self, start_time: float, latency: float, failed: bool):
+        self._healthy_in_window = 0
+
+        # Requests that were already in flight during the last decrease
+        # reflect the previous limit, reacting to them would collapse the limit
+        if start_time < self._last_decrease:
+            return
+
+        limit = max(self._min_limit, int(self._limit * self._decrease_factor))
+
+        if limit < self._limit:
+            self._limit = limit
+            self._last_decrease = time()
+
+            reason = "request failed" if failed else f"latency {latency:.3f} seconds"
+
+            _LOGGER.info(
+                f"Concurrency limit of {self._name} decreased to {self._limit}, Reason: {reason}"
+            )
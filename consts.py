@@ -6,11 +6,15 @@ ENV_AGTV_PASSWORD = "AGTV_PASSWORD"
 ENV_TMDB_API_KEY = "TMDB_API_KEY"
 ENV_SCAN_INTERVAL = "SCAN_INTERVAL"
 ENV_STORE_RAW_STREAM = "STORE_RAW_STREAM"
+ENV_PIPELINE_MODE = "PIPELINE_MODE"
+ENV_EVICTION_CYCLES = "EVICTION_CYCLES"
 
 DEFAULT_SCAN_INTERVAL = 60
 
 DEFAULT_TV_SHOWS_PAGES = 25
 
+DEFAULT_EVICTION_CYCLES = 24
+
 TMDB_MEDIA_TYPE = "media_type"
 TMDB_MEDIA_TYPE_TV_SHOW = "tv"
 TMDB_MEDIA_TYPE_MOVIE = "movie"
@@ -25,6 +29,7 @@ TMDB_MEDIA_TYPES = {
 }
 
 APOLLO_GROUP_TV_BASE_URL = "https://starlite.best/api/list"
+TMDB_BASE_URL = "https://api.themoviedb.org/3"
 TV_SHOWS_URL = f"m3u8/{AGTV_MEDIA_TYPE_TV_SHOWS}"
 MOVIES_URL = f"m3u8/{AGTV_MEDIA_TYPE_MOVIES}"
 
@@ -35,6 +40,7 @@ STREAM_FILES = "files"
 STREAM_FILE_TMDB = "tmdb"
 STREAM_FILE_MEDIA_PATH = "media"
 STREAM_FILE_MEDIA_URL = "mediaUrl"
+STREAM_MISSED_CYCLES = "missedCycles"
 
 STREAM_TV_VALIDATIONS = {STREAM_SEASON: r"(S+[\d]{2})", STREAM_EPISODE: r"(E+[\d]{2})"}
 
@@ -45,6 +51,11 @@ TMDB_MEDIA_FIRST_AIR_DATE = "first_air_date"
 TMDB_MEDIA_TITLE = "title"
 TMDB_MEDIA_RELEASE_DATE = "release_date"
 
+TMDB_MEDIA_KEYS = {
+    TMDB_MEDIA_TYPE_TV_SHOW: (TMDB_MEDIA_NAME, TMDB_MEDIA_FIRST_AIR_DATE),
+    TMDB_MEDIA_TYPE_MOVIE: (TMDB_MEDIA_TITLE, TMDB_MEDIA_RELEASE_DATE),
+}
+
 IMDB_ID = "tvg-id"
 AGTV_STREAM_TYPE = "tvg-type"
 STREAM_STATUS = "status"
@@ -61,9 +72,56 @@ MAX_THREADS_IO = 10
 MAX_THREADS_NO_IO = 50
 MAX_THREADS_PLAY = 5
 
+UPSTREAM_AGTV = "AGTV"
+UPSTREAM_TMDB = "TMDB"
+
+ADAPTIVE_LIMIT_MIN = 1
+ADAPTIVE_LIMIT_MAX = 50
+AGTV_LATENCY_THRESHOLD = 15
+TMDB_LATENCY_THRESHOLD = 2
+TMDB_REQUEST_TIMEOUT = 10
+
+AGTV_REQUEST_TIMEOUT = 30
+AGTV_PAGE_DEADLINE = 60
+AGTV_STAGE_DEADLINE = 120
+AGTV_HEDGE_PERCENTILE = 90
+AGTV_HEDGE_MIN_SAMPLES = 5
+AGTV_HEDGE_MIN_DELAY = 1
+AGTV_HEDGE_DEFAULT_DELAY = 10
+AGTV_LATENCY_HISTORY_SIZE = 100
+
+HTTP_STATUS_TOO_MANY_REQUESTS = 429
+HTTP_STATUS_SERVER_ERROR = 500
+
+PIPELINE_QUEUE_SIZE = 1000
+PIPELINE_STAGE_FETCH = "fetch"
+PIPELINE_STAGE_EXTRACT = "extract"
+PIPELINE_STAGE_TMDB = "tmdb"
+PIPELINE_STAGE_FINALIZE = "finalize"
+PIPELINE_STAGES = [
+    PIPELINE_STAGE_FETCH,
+    PIPELINE_STAGE_EXTRACT,
+    PIPELINE_STAGE_TMDB,
+    PIPELINE_STAGE_FINALIZE,
+]
+
 TMDB_FILE = "cache/tmdb.json"
 STREAMS_FILE = "cache/streams.json"
 AGTV_FILE = "cache/agtv.json"
+JOURNAL_FILE = "cache/journal.jsonl"
+
+# Temporary files are kept next to the tree they are written into (same volume),
+# outside of the media type directories scanned by the media server
+TEMP_DIRECTORY_NAME = ".tmp"
+TEMP_DIRECTORIES = [f"cache/{TEMP_DIRECTORY_NAME}", f"media/{TEMP_DIRECTORY_NAME}"]
+
+JOURNAL_TYPE = "type"
+JOURNAL_KEY = "key"
+JOURNAL_DATA = "data"
+JOURNAL_TIMESTAMP = "timestamp"
+JOURNAL_TYPE_ENDPOINT = "endpoint"
+JOURNAL_TYPE_TMDB = "tmdb"
+JOURNAL_TYPE_STREAM = "stream"
 
 CLEAN_CHARS = {"&": "and", ":": "", "?": "", "/": "-", "*": "_", '"': "'"}
 
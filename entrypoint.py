@@ -1,20 +1,36 @@
 #!/usr/bin/env python3
 
+from collections import deque
 import json
 import logging
 import os
+import queue
 import re
+import shutil
 import sys
 import threading
 from time import sleep, time
 
 import requests as requests
 
+from concurrency import AdaptiveConcurrencyLimiter
 from consts import (
+    ADAPTIVE_LIMIT_MAX,
+    ADAPTIVE_LIMIT_MIN,
     AGTV_FILE,
+    AGTV_HEDGE_DEFAULT_DELAY,
+    AGTV_HEDGE_MIN_DELAY,
+    AGTV_HEDGE_MIN_SAMPLES,
+    AGTV_HEDGE_PERCENTILE,
+    AGTV_LATENCY_HISTORY_SIZE,
+    AGTV_LATENCY_THRESHOLD,
+    AGTV_PAGE_DEADLINE,
+    AGTV_REQUEST_TIMEOUT,
+    AGTV_STAGE_DEADLINE,
     APOLLO_GROUP_TV_BASE_URL,
     BREAK_LINE,
     CLEAN_CHARS,
+    DEFAULT_EVICTION_CYCLES,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_TV_SHOWS_PAGES,
     EMPTY_STRING,
@@ -22,19 +38,38 @@ from consts import (
     ENV_AGTV_PASSWORD,
     ENV_AGTV_USERNAME,
     ENV_DEBUG,
+    ENV_EVICTION_CYCLES,
+    ENV_PIPELINE_MODE,
     ENV_SCAN_INTERVAL,
     ENV_TMDB_API_KEY,
     EXTRACT_KEYS,
+    HTTP_STATUS_SERVER_ERROR,
+    HTTP_STATUS_TOO_MANY_REQUESTS,
     IMDB_ID,
+    JOURNAL_DATA,
+    JOURNAL_FILE,
+    JOURNAL_KEY,
+    JOURNAL_TIMESTAMP,
+    JOURNAL_TYPE,
+    JOURNAL_TYPE_ENDPOINT,
+    JOURNAL_TYPE_STREAM,
+    JOURNAL_TYPE_TMDB,
     LOG_FORMAT,
     M3U_EXT_INF,
     MAX_THREADS_IO,
     MAX_THREADS_NO_IO,
     MOVIES_URL,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_STAGE_EXTRACT,
+    PIPELINE_STAGE_FETCH,
+    PIPELINE_STAGE_FINALIZE,
+    PIPELINE_STAGE_TMDB,
+    PIPELINE_STAGES,
     STREAM_EPISODE,
     STREAM_FILE_MEDIA_PATH,
     STREAM_FILE_TMDB,
     STREAM_FILES,
+    STREAM_MISSED_CYCLES,
     STREAM_SEASON,
     STREAM_STATUS,
     STREAM_STATUS_EXISTS,
@@ -46,8 +81,11 @@ from consts import (
     STREAM_TV_VALIDATIONS,
     STREAM_URL,
     STREAMS_FILE,
+    TMDB_BASE_URL,
     TMDB_FILE,
+    TMDB_LATENCY_THRESHOLD,
     TMDB_MEDIA_FIRST_AIR_DATE,
+    TMDB_MEDIA_KEYS,
     TMDB_MEDIA_NAME,
     TMDB_MEDIA_RELEASE_DATE,
     TMDB_MEDIA_TITLE,
@@ -55,7 +93,12 @@ from consts import (
     TMDB_MEDIA_TYPE_MOVIE,
     TMDB_MEDIA_TYPE_TV_SHOW,
     TMDB_MEDIA_TYPES,
+    TEMP_DIRECTORIES,
+    TEMP_DIRECTORY_NAME,
+    TMDB_REQUEST_TIMEOUT,
     TV_SHOWS_URL,
+    UPSTREAM_AGTV,
+    UPSTREAM_TMDB,
 )
 
 DEBUG = str(os.environ.get(ENV_DEBUG, False)).lower() == str(True).lower()
@@ -85,9 +128,28 @@ class MediaSyncManager:
         self._scan_interval = int(
             str(os.environ.get(ENV_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL))
         )
+        self._eviction_cycles = int(
+            str(os.environ.get(ENV_EVICTION_CYCLES, DEFAULT_EVICTION_CYCLES))
+        )
+        self._pipeline_mode = (
+            str(os.environ.get(ENV_PIPELINE_MODE, False)).lower() == str(True).lower()
+        )
 
         self._is_ready = self._username is not None and self._password is not None
-        self._semaphore_io = threading.Semaphore(value=MAX_THREADS_IO)
+        self._limiter_agtv = AdaptiveConcurrencyLimiter(
+            UPSTREAM_AGTV,
+            MAX_THREADS_IO,
+            ADAPTIVE_LIMIT_MIN,
+            ADAPTIVE_LIMIT_MAX,
+            AGTV_LATENCY_THRESHOLD,
+        )
+        self._limiter_tmdb = AdaptiveConcurrencyLimiter(
+            UPSTREAM_TMDB,
+            MAX_THREADS_IO,
+            ADAPTIVE_LIMIT_MIN,
+            ADAPTIVE_LIMIT_MAX,
+            TMDB_LATENCY_THRESHOLD,
+        )
         self._semaphore_no_io = threading.Semaphore(value=MAX_THREADS_NO_IO)
         self._tmdb_data = {}
         self._streams_data = {}
@@ -96,6 +158,19 @@ class MediaSyncManager:
         self._reported_as_fault = []
         self._process_number = 0
         self._has_cache = False
+        self._pipeline_lock = threading.Lock()
+        self._pipeline_stats = {}
+        self._journal_lock = threading.Lock()
+        self._journal = None
+        self._journal_endpoints = {}
+        self._hedge_lock = threading.Lock()
+        self._agtv_latencies = deque(maxlen=AGTV_LATENCY_HISTORY_SIZE)
+        self._stale_endpoints = []
+        self._missing_endpoints = []
+        self._seen_streams = set()
+        self._files_lock = threading.Lock()
+        self._files_index = {}
+        self._stream_files = {}
 
         self._headers = {
             "accept": "application/json",
@@ -106,8 +181,7 @@ class MediaSyncManager:
         if self._is_ready:
             _LOGGER.info("Initializing AGTV2STRM")
 
-            self._load_tmdb_file()
-            self._load_streams_file()
+            self._load_cache()
 
             self._endpoints = [
                 f"{TV_SHOWS_URL}/{i + 1}" for i in range(0, self._max_tv_shows_pages)
@@ -123,31 +197,270 @@ class MediaSyncManager:
         else:
             _LOGGER.error("Failed to initialize AGTV2STRM, Please set credentials")
 
+    def _load_cache(self):
+        self._remove_temp_files()
+        self._load_tmdb_file()
+        self._load_streams_file()
+        self._load_agtv_file()
+        self._load_journal_file()
+        self._build_files_index()
+
     def _process(self):
         self._process_number += 1
 
         start_time = time()
 
-        self._load_agtv_data()
-        self._extract_streams()
-        self._load_tmdb_data()
-        self._merge_tmdb_into_streams()
-        self._prepare_directories()
-        self._finalize_stream_files()
+        self._seen_streams = set()
+
+        self._open_journal()
+        self._migrate_stream_paths()
+
+        if self._pipeline_mode:
+            self._process_pipeline()
+
+        else:
+            self._load_agtv_data()
+            self._extract_streams()
+            self._load_tmdb_data()
+            self._merge_tmdb_into_streams()
+            self._prepare_directories()
+            self._finalize_stream_files()
+
+        self._reconcile_streams()
+        self._close_journal()
         self._fault_report()
 
         execution_time = time() - start_time
 
         _LOGGER.info(f"Complete processing, Duration: {execution_time:.3f} seconds")
 
+        for limiter in [self._limiter_agtv, self._limiter_tmdb]:
+            _LOGGER.info(f"Upstream concurrency, Metrics: {limiter.metrics}")
+
+    def _process_pipeline(self):
+        start_time = time()
+        _LOGGER.info("Processing streams in pipeline mode")
+
+        self._pipeline_stats = {
+            stage: {"items": 0, "busy": 0.0, "finished": 0.0}
+            for stage in PIPELINE_STAGES
+        }
+
+        stage_deadline = start_time + AGTV_STAGE_DEADLINE
+
+        self._stale_endpoints = []
+        self._missing_endpoints = []
+
+        self._remove_unconfigured_endpoints()
+
+        endpoints_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        tmdb_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        streams_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+        pending_streams = {}
+        requested_imdb_ids = set()
+        loaded_imdb_ids = set()
+
+        fetch_threads = [
+            threading.Thread(
+                target=self._pipeline_fetch,
+                args=[endpoint, stage_deadline, endpoints_queue],
+            )
+            for endpoint in self._endpoints
+        ]
+        extract_thread = threading.Thread(
+            target=self._pipeline_extract,
+            args=[
+                endpoints_queue,
+                tmdb_queue,
+                streams_queue,
+                pending_streams,
+                requested_imdb_ids,
+                loaded_imdb_ids,
+            ],
+        )
+        tmdb_threads = [
+            threading.Thread(
+                target=self._pipeline_tmdb,
+                args=[tmdb_queue, streams_queue, pending_streams, loaded_imdb_ids],
+            )
+            for _ in range(0, ADAPTIVE_LIMIT_MAX)
+        ]
+        finalize_threads = [
+            threading.Thread(target=self._pipeline_finalize, args=[streams_queue])
+            for _ in range(0, MAX_THREADS_NO_IO)
+        ]
+
+        for thread in (
+            fetch_threads + [extract_thread] + tmdb_threads + finalize_threads
+        ):
+            thread.start()
+
+        stages = [
+            (PIPELINE_STAGE_FETCH, fetch_threads, endpoints_queue, 1),
+            (PIPELINE_STAGE_EXTRACT, [extract_thread], tmdb_queue, len(tmdb_threads)),
+            (PIPELINE_STAGE_TMDB, tmdb_threads, streams_queue, len(finalize_threads)),
+            (PIPELINE_STAGE_FINALIZE, finalize_threads, None, 0),
+        ]
+
+        for stage, threads, next_queue, consumers in stages:
+            for thread in threads:
+                thread.join()
+
+            self._pipeline_stats[stage]["finished"] = time() - start_time
+
+            if stage == PIPELINE_STAGE_FETCH:
+                self._log_endpoints_status(time() - start_time)
+
+            for _ in range(0, consumers):
+                next_queue.put(None)
+
+        self._save_agtv_file()
+        self._save_file(TMDB_FILE, json.dumps(self._tmdb_data, indent=4))
+        self._save_file(STREAMS_FILE, json.dumps(self._streams_data, indent=4))
+
+        for stage in PIPELINE_STAGES:
+            stage_stats = self._pipeline_stats[stage]
+
+            _LOGGER.info(
+                f"Pipeline stage '{stage}' processed {stage_stats['items']:,} items, "
+                f"Busy: {stage_stats['busy']:.3f} seconds, "
+                f"Finished after: {stage_stats['finished']:.3f} seconds"
+            )
+
+        execution_time = time() - start_time
+
+        _LOGGER.info(
+            f"Processed {len(self._streams_data.keys()):,} streams in pipeline mode, Duration: {execution_time:.3f} seconds"
+        )
+
+    def _pipeline_fetch(self, endpoint, stage_deadline, endpoints_queue):
+        start_time = time()
+
+        self._load_endpoint_data(endpoint, stage_deadline)
+
+        self._update_pipeline_stats(PIPELINE_STAGE_FETCH, start_time)
+
+        if endpoint in self._agtv_data:
+            endpoints_queue.put(endpoint)
+
+    def _pipeline_extract(
+        self,
+        endpoints_queue,
+        tmdb_queue,
+        streams_queue,
+        pending_streams,
+        requested_imdb_ids,
+        loaded_imdb_ids,
+    ):
+        while True:
+            endpoint = endpoints_queue.get()
+
+            if endpoint is None:
+                break
+
+            start_time = time()
+
+            stream_ids = self._extract_streams_from_list(endpoint)
+
+            for stream_id in stream_ids:
+                is_relevant = self._can_merge_tmdb_into_stream(
+                    stream_id
+                ) or self._is_ready_stream(stream_id)
+
+                if not is_relevant:
+                    continue
+
+                imdb_id = self._streams_data[stream_id].get(IMDB_ID)
+                request_imdb_id = False
+
+                with self._pipeline_lock:
+                    requires_tmdb = (
+                        imdb_id in self._tmdb_data
+                        and self._tmdb_data.get(imdb_id) is None
+                        and imdb_id not in loaded_imdb_ids
+                    )
+
+                    if requires_tmdb:
+                        pending_streams.setdefault(imdb_id, []).append(stream_id)
+
+                        if imdb_id not in requested_imdb_ids:
+                            requested_imdb_ids.add(imdb_id)
+                            request_imdb_id = True
+
+                # Queues are written outside the lock, a full queue must not
+                # block TMDB workers that are releasing pending streams
+                if not requires_tmdb:
+                    streams_queue.put(stream_id)
+
+                elif request_imdb_id:
+                    tmdb_queue.put(imdb_id)
+
+            self._update_pipeline_stats(PIPELINE_STAGE_EXTRACT, start_time)
+
+    def _pipeline_tmdb(
+        self, tmdb_queue, streams_queue, pending_streams, loaded_imdb_ids
+    ):
+        while True:
+            imdb_id = tmdb_queue.get()
+
+            if imdb_id is None:
+                break
+
+            start_time = time()
+
+            self._load_tmdb_media_data(imdb_id)
+
+            with self._pipeline_lock:
+                loaded_imdb_ids.add(imdb_id)
+                stream_ids = pending_streams.pop(imdb_id, [])
+
+            self._update_pipeline_stats(PIPELINE_STAGE_TMDB, start_time)
+
+            for stream_id in stream_ids:
+                streams_queue.put(stream_id)
+
+    def _pipeline_finalize(self, streams_queue):
+        while True:
+            stream_id = streams_queue.get()
+
+            if stream_id is None:
+                break
+
+            start_time = time()
+
+            if self._can_merge_tmdb_into_stream(stream_id):
+                self._merge_tmdb_into_stream(stream_id)
+
+            if self._is_ready_stream(stream_id):
+                self._update_stream_file(stream_id)
+
+            self._update_pipeline_stats(PIPELINE_STAGE_FINALIZE, start_time)
+
+    def _update_pipeline_stats(self, stage, start_time):
+        execution_time = time() - start_time
+
+        with self._pipeline_lock:
+            stage_stats = self._pipeline_stats[stage]
+            stage_stats["items"] += 1
+            stage_stats["busy"] += execution_time
+
     def _load_agtv_data(self):
         start_time = time()
         _LOGGER.info("Loading Apollo Group TV lists")
 
+        stage_deadline = start_time + AGTV_STAGE_DEADLINE
         threads = []
 
+        self._stale_endpoints = []
+        self._missing_endpoints = []
+
+        self._remove_unconfigured_endpoints()
+
         for endpoint in self._endpoints:
-            thread = threading.Thread(target=self._load_endpoint_data, args=[endpoint])
+            thread = threading.Thread(
+                target=self._load_endpoint_data, args=[endpoint, stage_deadline]
+            )
             threads.append(thread)
             thread.start()
 
@@ -158,43 +471,209 @@ class MediaSyncManager:
 
         execution_time = time() - start_time
 
+        self._log_endpoints_status(execution_time)
+
+    def _remove_unconfigured_endpoints(self):
+        # Lists restored from cache for pages no longer requested would keep
+        # their streams alive and never let them be evicted
+        removed_endpoints = [
+            endpoint for endpoint in self._agtv_data if endpoint not in self._endpoints
+        ]
+
+        for endpoint in removed_endpoints:
+            del self._agtv_data[endpoint]
+
+        if len(removed_endpoints) > 0:
+            _LOGGER.info(
+                f"Removed data of endpoints no longer configured: {removed_endpoints}"
+            )
+
+    def _log_endpoints_status(self, execution_time):
+        stale_endpoints = len(self._stale_endpoints)
+        missing_endpoints = len(self._missing_endpoints)
+        loaded_endpoints = len(self._endpoints) - stale_endpoints - missing_endpoints
+
         _LOGGER.info(
-            f"Loaded {len(self._endpoints)} lists, Duration: {execution_time:.3f} seconds"
+            f"Loaded {loaded_endpoints} lists, "
+            f"Last known data used for {stale_endpoints} lists, Missing {missing_endpoints} lists, "
+            f"Duration: {execution_time:.3f} seconds"
         )
 
-    def _load_endpoint_data(self, endpoint):
-        self._semaphore_io.acquire()
+    def _load_endpoint_data(self, endpoint, stage_deadline):
+        journal_lines = self._journal_endpoints.pop(endpoint, None)
+
+        if journal_lines is not None:
+            self._agtv_data[endpoint] = journal_lines
+
+            _LOGGER.debug(
+                f"Endpoint '{endpoint}' data restored from journal, Lines: {len(journal_lines)}"
+            )
+
+            return
+
+        attempt = {
+            "lines": None,
+            "pending": 0,
+            "hedged": False,
+            "abandoned": False,
+            "start_time": None,
+        }
+        started = threading.Event()
+        completed = threading.Event()
+
+        self._start_endpoint_attempt(endpoint, attempt, started, completed)
+
+        # Hedge delay and page deadline count from the moment the request is sent,
+        # time spent waiting for a concurrency slot is bounded by the stage deadline only
+        if started.wait(max(0, stage_deadline - time())):
+            with self._hedge_lock:
+                start_time = attempt["start_time"]
+
+            deadline = min(start_time + AGTV_PAGE_DEADLINE, stage_deadline)
+            hedge_delay = self._get_hedge_delay()
+
+            completed.wait(max(0, min(start_time + hedge_delay, deadline) - time()))
+
+            if not completed.is_set() and time() < deadline:
+                _LOGGER.info(
+                    f"Hedging request for endpoint '{endpoint}', Delay: {hedge_delay:.3f} seconds"
+                )
+
+                self._start_endpoint_attempt(
+                    endpoint, attempt, started, completed, hedged=True
+                )
+
+                completed.wait(max(0, deadline - time()))
+
+        with self._hedge_lock:
+            lines = attempt["lines"]
+            attempt["abandoned"] = True
+
+        if lines is None:
+            last_known_lines = self._agtv_data.get(endpoint)
+
+            if last_known_lines is None:
+                self._missing_endpoints.append(endpoint)
+
+                _LOGGER.error(
+                    f"Endpoint '{endpoint}' was not loaded before its deadline, No previous data available"
+                )
+
+            else:
+                self._stale_endpoints.append(endpoint)
+
+                _LOGGER.warning(
+                    f"Endpoint '{endpoint}' was not loaded before its deadline, Using last known data, Lines: {len(last_known_lines)}"
+                )
+
+            return
+
+        self._agtv_data[endpoint] = lines
+
+        self._write_journal(JOURNAL_TYPE_ENDPOINT, endpoint, lines)
+
+        _LOGGER.debug(f"Endpoint '{endpoint}' data loaded, Lines: {len(lines)}")
+
+    def _start_endpoint_attempt(
+        self, endpoint, attempt, started, completed, hedged=False
+    ):
+        # Both are updated together, a failing first attempt that sees the hedge
+        # flag without its pending count would complete the page too early
+        with self._hedge_lock:
+            attempt["pending"] += 1
+
+            if hedged:
+                attempt["hedged"] = True
+
+        # Attempts are not joined, a losing or hung request must not hold the cycle
+        thread = threading.Thread(
+            target=self._load_endpoint_attempt,
+            args=[endpoint, attempt, started, completed],
+            daemon=True,
+        )
+        thread.start()
+
+    def _load_endpoint_attempt(self, endpoint, attempt, started, completed):
+        request_start_time = self._limiter_agtv.acquire()
+
+        with self._hedge_lock:
+            is_abandoned = attempt["abandoned"]
+
+            if is_abandoned:
+                attempt["pending"] -= 1
+
+            elif attempt["start_time"] is None:
+                attempt["start_time"] = request_start_time
+
+                started.set()
+
+        # Page already gave up while this attempt was queued, nothing to send
+        if is_abandoned:
+            self._limiter_agtv.discard()
+
+            return
+
+        failed = False
+        lines = None
 
         try:
             _LOGGER.debug(f"Load endpoint data, Endpoint: {endpoint}")
 
             url = f"{APOLLO_GROUP_TV_BASE_URL}/{self._username}/{self._password}/{endpoint}"
 
-            response = requests.get(url)
+            response = requests.get(url, timeout=AGTV_REQUEST_TIMEOUT)
+            failed = self._is_upstream_failure(response)
 
             if response.ok:
                 content = response.text
                 lines = content.split(BREAK_LINE)
 
-                self._agtv_data[endpoint] = lines
-
-                _LOGGER.debug(f"Endpoint '{endpoint}' data loaded, Lines: {len(lines)}")
-
         except Exception as ex:
             exc_type, exc_obj, exc_tb = sys.exc_info()
+            failed = self._is_upstream_error(ex)
 
             _LOGGER.error(
                 f"Failed to load endpoint data, Endpoint: {endpoint}, Error: {ex}, Line: {exc_tb.tb_lineno}"
             )
 
-        self._semaphore_io.release()
+        self._limiter_agtv.release(request_start_time, failed)
+
+        with self._hedge_lock:
+            attempt["pending"] -= 1
+
+            if lines is not None and attempt["lines"] is None:
+                attempt["lines"] = lines
+
+                self._agtv_latencies.append(time() - request_start_time)
+
+                completed.set()
+
+            elif attempt["pending"] == 0 and attempt["hedged"]:
+                completed.set()
+
+    def _get_hedge_delay(self) -> float:
+        latencies = sorted(self._agtv_latencies)
+
+        if len(latencies) < AGTV_HEDGE_MIN_SAMPLES:
+            return AGTV_HEDGE_DEFAULT_DELAY
+
+        index = min(
+            len(latencies) - 1, int(len(latencies) * AGTV_HEDGE_PERCENTILE / 100)
+        )
+
+        hedge_delay = max(AGTV_HEDGE_MIN_DELAY, latencies[index])
+
+        return hedge_delay
 
     def _extract_streams(self):
         start_time = time()
         _LOGGER.info("Extract streams from Apollo Group TV lists")
 
         threads = []
-        for name in self._agtv_data:
+        for name in self._endpoints:
+            if name not in self._agtv_data:
+                continue
+
             thread = threading.Thread(
                 target=self._extract_streams_from_list, args=[name]
             )
@@ -212,9 +691,11 @@ class MediaSyncManager:
             f"Extracted {len(self._streams_data.keys()):,} streams, Duration: {execution_time:.3f} seconds"
         )
 
-    def _extract_streams_from_list(self, name):
+    def _extract_streams_from_list(self, name) -> list[str]:
         self._semaphore_no_io.acquire()
 
+        stream_ids = []
+
         try:
             lines = self._agtv_data[name]
 
@@ -226,7 +707,9 @@ class MediaSyncManager:
                     url = lines[line_number + 1].replace(BREAK_LINE, EMPTY_STRING)
 
                     if self._verify_url(url):
-                        self._add_stream_info(stream_info, url)
+                        stream_id = self._add_stream_info(stream_info, url)
+
+                        stream_ids.append(stream_id)
 
                     else:
                         _LOGGER.warning(
@@ -240,9 +723,13 @@ class MediaSyncManager:
                 f"Failed to add stream, Error: {ex}, Line: {exc_tb.tb_lineno}"
             )
 
+        self._seen_streams.update(stream_ids)
+
         self._semaphore_no_io.release()
 
-    def _add_stream_info(self, stream_info, media_url):
+        return stream_ids
+
+    def _add_stream_info(self, stream_info, media_url) -> str:
         stream_data = self._get_stream_info(stream_info)
         imdb_id = stream_data.get(IMDB_ID)
 
@@ -286,6 +773,8 @@ class MediaSyncManager:
         elif not is_stream_fault and not in_tmdb_list:
             self._tmdb_data[imdb_id] = None
 
+        return stream_id
+
     def _load_tmdb_data(self):
         start_time = time()
         _LOGGER.info("Load TMDB data")
@@ -314,14 +803,18 @@ class MediaSyncManager:
         )
 
     def _load_tmdb_media_data(self, imdb_id):
-        self._semaphore_io.acquire()
+        request_start_time = self._limiter_tmdb.acquire()
+        failed = False
 
         try:
             _LOGGER.debug(f"Loading TMDB data for {imdb_id}")
 
-            url = f"https://api.themoviedb.org/3/find/{imdb_id}?external_source=imdb_id"
+            url = f"{TMDB_BASE_URL}/find/{imdb_id}?external_source=imdb_id"
 
-            response = requests.get(url, headers=self._headers)
+            response = requests.get(
+                url, headers=self._headers, timeout=TMDB_REQUEST_TIMEOUT
+            )
+            failed = self._is_upstream_failure(response)
             data = response.json()
 
             if data.get("success", True):
@@ -333,16 +826,22 @@ class MediaSyncManager:
 
                         self._tmdb_data[imdb_id] = data_object
 
+                tmdb_info = self._tmdb_data.get(imdb_id)
+
+                if tmdb_info is not None:
+                    self._write_journal(JOURNAL_TYPE_TMDB, imdb_id, tmdb_info)
+
             _LOGGER.debug(f"Loaded TMDB data for {imdb_id}, Data: {data}")
 
         except Exception as ex:
             exc_type, exc_obj, exc_tb = sys.exc_info()
+            failed = failed or self._is_upstream_error(ex)
 
             _LOGGER.error(
                 f"Failed to enrich media data, IMDB ID: {imdb_id}, Error: {ex}, Line: {exc_tb.tb_lineno}"
             )
 
-        self._semaphore_io.release()
+        self._limiter_tmdb.release(request_start_time, failed)
 
     def _merge_tmdb_into_streams(self):
         start_time = time()
@@ -434,29 +933,7 @@ class MediaSyncManager:
                         stream_status != STREAM_STATUS_FAULT
                         and STREAM_FILES not in stream_info
                     ):
-                        release_date_parts = media_release_date.split("-")
-                        year = release_date_parts[0]
-                        root_path = self._clean_name(f"{media_title} ({year})")
-
-                        agtv_media_type = TMDB_MEDIA_TYPES.get(media_type)
-                        stream_path: str | None = f"{root_path}/{root_path}"
-
-                        if media_type == TMDB_MEDIA_TYPE_TV_SHOW:
-                            season = stream_info.get(STREAM_SEASON)
-                            episode = stream_info.get(STREAM_EPISODE)
-
-                            season_name = season.replace("S", "Season ")
-                            stream_path = f"{stream_path} - {season_name}/{root_path} - {season}{episode}"
-
-                        tmdb_path = (
-                            f"media/{agtv_media_type}/{root_path}/{root_path}.json"
-                        )
-                        media_path = f"media/{agtv_media_type}/{stream_path}.strm"
-
-                        stream_info[STREAM_FILES] = {
-                            STREAM_FILE_TMDB: tmdb_path,
-                            STREAM_FILE_MEDIA_PATH: media_path,
-                        }
+                        stream_info[STREAM_FILES] = self._get_stream_files(stream_info)
 
         except Exception as ex:
             exc_type, exc_obj, exc_tb = sys.exc_info()
@@ -579,6 +1056,10 @@ class MediaSyncManager:
 
             stream_info[STREAM_STATUS] = STREAM_STATUS_EXISTS
 
+            self._index_stream_files(stream_id, stream_files)
+
+            self._write_journal(JOURNAL_TYPE_STREAM, stream_id, stream_info)
+
         except Exception as ex:
             exc_type, exc_obj, exc_tb = sys.exc_info()
 
@@ -588,6 +1069,335 @@ class MediaSyncManager:
 
         self._semaphore_no_io.release()
 
+    def _migrate_stream_paths(self):
+        start_time = time()
+        _LOGGER.info("Verifying stream paths")
+
+        title_migrations = {}
+
+        for stream_id in self._streams_data:
+            stream_info = self._streams_data[stream_id]
+            stream_status = stream_info.get(STREAM_STATUS, STREAM_STATUS_NEW)
+            stream_files = stream_info.get(STREAM_FILES)
+
+            if stream_status != STREAM_STATUS_EXISTS or stream_files is None:
+                continue
+
+            try:
+                expected_info = self._get_expected_stream_info(stream_info)
+                expected_files = self._get_stream_files(expected_info)
+
+                if expected_files != stream_files:
+                    old_root = os.path.dirname(stream_files.get(STREAM_FILE_TMDB))
+                    new_root = os.path.dirname(expected_files.get(STREAM_FILE_TMDB))
+
+                    title_migration = title_migrations.setdefault(
+                        (old_root, new_root), []
+                    )
+                    title_migration.append((stream_id, expected_info, expected_files))
+
+            except Exception as ex:
+                exc_type, exc_obj, exc_tb = sys.exc_info()
+
+                _LOGGER.error(
+                    f"Failed to verify stream path, ID: {stream_id}, Error: {ex}, Line: {exc_tb.tb_lineno}"
+                )
+
+        if len(title_migrations) == 0:
+            return
+
+        moved_directories = 0
+        renamed_files = 0
+        copied_files = 0
+        migrated_streams = 0
+
+        migration_roots = {old_root for old_root, _ in title_migrations}
+        indexed_files = {}
+
+        with self._files_lock:
+            for file_path in self._files_index:
+                file_root = "/".join(file_path.split("/")[:3])
+
+                if file_root in migration_roots:
+                    indexed_files.setdefault(file_root, set()).add(file_path)
+
+        for old_root, new_root in title_migrations:
+            migrations = title_migrations[(old_root, new_root)]
+
+            group_stream_ids = {stream_id for stream_id, _, _ in migrations}
+            group_files = {
+                file_path
+                for stream_id in group_stream_ids
+                for file_path in self._streams_data[stream_id][STREAM_FILES].values()
+            }
+
+            # Title directory may also hold files of other streams
+            # (e.g. another IMDB ID with the same title and year), these must stay
+            owns_directory = indexed_files.get(old_root, set()) <= group_files
+
+            title_renamed_files = 0
+            title_copied_files = 0
+
+            try:
+                if (
+                    old_root != new_root
+                    and owns_directory
+                    and os.path.isdir(old_root)
+                    and not os.path.exists(new_root)
+                ):
+                    self._prepare_directory(os.path.dirname(new_root))
+
+                    os.rename(old_root, new_root)
+                    moved_directories += 1
+
+                    _LOGGER.info(
+                        f"Moved title directory '{old_root}' to '{new_root}', Streams: {len(migrations):,}"
+                    )
+
+                # Also true when the directory was moved before an interrupted cycle
+                is_moved = (
+                    old_root != new_root
+                    and not os.path.exists(old_root)
+                    and os.path.isdir(new_root)
+                )
+
+                for stream_id, expected_info, expected_files in migrations:
+                    stream_info = self._streams_data[stream_id]
+                    stream_files = stream_info.get(STREAM_FILES)
+
+                    for file_key in expected_files:
+                        old_path = stream_files.get(file_key)
+                        new_path = expected_files.get(file_key)
+
+                        current_path = (
+                            f"{new_root}{old_path[len(old_root):]}"
+                            if is_moved
+                            else old_path
+                        )
+
+                        if current_path == new_path:
+                            continue
+
+                        shared_stream_ids = (
+                            self._files_index.get(old_path, set()) - group_stream_ids
+                        )
+
+                        if os.path.exists(current_path) and len(shared_stream_ids) > 0:
+                            self._prepare_directory(os.path.dirname(new_path))
+
+                            shutil.copyfile(current_path, new_path)
+                            title_copied_files += 1
+
+                            _LOGGER.debug(f"Copied '{current_path}' to '{new_path}'")
+
+                        elif os.path.exists(current_path):
+                            self._prepare_directory(os.path.dirname(new_path))
+
+                            os.rename(current_path, new_path)
+                            title_renamed_files += 1
+
+                            _LOGGER.debug(f"Renamed '{current_path}' to '{new_path}'")
+
+                            self._remove_empty_directories(current_path)
+
+                        elif not os.path.exists(new_path):
+                            # Nothing to move, file will be written by the current cycle
+                            expected_info[STREAM_STATUS] = STREAM_STATUS_READY
+
+                    expected_info[STREAM_FILES] = expected_files
+
+                    self._streams_data[stream_id] = expected_info
+                    self._index_stream_files(stream_id, expected_files)
+                    self._write_journal(JOURNAL_TYPE_STREAM, stream_id, expected_info)
+
+                    migrated_streams += 1
+
+            except Exception as ex:
+                exc_type, exc_obj, exc_tb = sys.exc_info()
+
+                _LOGGER.error(
+                    f"Failed to migrate title directory '{old_root}' to '{new_root}', Error: {ex}, Line: {exc_tb.tb_lineno}"
+                )
+
+            renamed_files += title_renamed_files
+            copied_files += title_copied_files
+
+            # Files moved one by one are only listed at debug level,
+            # the title mapping keeps every migration visible
+            if title_renamed_files + title_copied_files > 0:
+                _LOGGER.info(
+                    f"Migrated files of title '{old_root}' to '{new_root}', "
+                    f"Streams: {len(migrations):,}, Renamed: {title_renamed_files:,}, Copied: {title_copied_files:,}"
+                )
+
+        self._save_file(STREAMS_FILE, json.dumps(self._streams_data, indent=4))
+
+        execution_time = time() - start_time
+
+        _LOGGER.info(
+            f"Migrated {migrated_streams:,} streams, "
+            f"Moved {moved_directories:,} title directories, "
+            f"Renamed {renamed_files:,} files, Copied {copied_files:,} shared files, "
+            f"Duration: {execution_time:.3f} seconds"
+        )
+
+    def _get_expected_stream_info(self, stream_info) -> dict:
+        expected_info = dict(stream_info)
+
+        media_type = stream_info.get(TMDB_MEDIA_TYPE)
+        tmdb_info = self._tmdb_data.get(stream_info.get(IMDB_ID))
+
+        if tmdb_info is not None and tmdb_info.get(TMDB_MEDIA_TYPE) == media_type:
+            title_key, release_date_key = TMDB_MEDIA_KEYS[media_type]
+
+            expected_info[TMDB_MEDIA_TITLE] = tmdb_info.get(title_key)
+            expected_info[TMDB_MEDIA_RELEASE_DATE] = tmdb_info.get(release_date_key)
+
+        return expected_info
+
+    def _get_stream_files(self, stream_info) -> dict:
+        media_type = stream_info.get(TMDB_MEDIA_TYPE)
+        media_title = stream_info.get(TMDB_MEDIA_TITLE)
+        media_release_date = stream_info.get(TMDB_MEDIA_RELEASE_DATE)
+
+        release_date_parts = media_release_date.split("-")
+        year = release_date_parts[0]
+        root_path = self._clean_name(f"{media_title} ({year})")
+
+        agtv_media_type = TMDB_MEDIA_TYPES.get(media_type)
+        stream_path: str | None = f"{root_path}/{root_path}"
+
+        if media_type == TMDB_MEDIA_TYPE_TV_SHOW:
+            season = stream_info.get(STREAM_SEASON)
+            episode = stream_info.get(STREAM_EPISODE)
+
+            season_name = season.replace("S", "Season ")
+            stream_path = (
+                f"{stream_path} - {season_name}/{root_path} - {season}{episode}"
+            )
+
+        tmdb_path = f"media/{agtv_media_type}/{root_path}/{root_path}.json"
+        media_path = f"media/{agtv_media_type}/{stream_path}.strm"
+
+        stream_files = {
+            STREAM_FILE_TMDB: tmdb_path,
+            STREAM_FILE_MEDIA_PATH: media_path,
+        }
+
+        return stream_files
+
+    def _reconcile_streams(self):
+        start_time = time()
+        _LOGGER.info("Reconciling streams")
+
+        missing_endpoints = [
+            endpoint for endpoint in self._endpoints if endpoint not in self._agtv_data
+        ]
+
+        if len(missing_endpoints) > 0:
+            _LOGGER.warning(
+                f"Skipping reconciliation, No data for endpoints: {missing_endpoints}"
+            )
+
+            return
+
+        evicted_streams = []
+
+        for stream_id in self._streams_data:
+            stream_info = self._streams_data[stream_id]
+
+            if stream_id in self._seen_streams:
+                stream_info.pop(STREAM_MISSED_CYCLES, None)
+
+                continue
+
+            missed_cycles = stream_info.get(STREAM_MISSED_CYCLES, 0) + 1
+            stream_info[STREAM_MISSED_CYCLES] = missed_cycles
+
+            if 0 < self._eviction_cycles <= missed_cycles:
+                evicted_streams.append(stream_id)
+
+        removed_files = 0
+        removed_directories = 0
+
+        for stream_id in evicted_streams:
+            self._streams_data.pop(stream_id)
+
+            if stream_id in self._reported_as_fault:
+                self._reported_as_fault.remove(stream_id)
+
+            for file_path in self._unindex_stream_files(stream_id):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    removed_files += 1
+
+                removed_directories += self._remove_empty_directories(file_path)
+
+            _LOGGER.debug(f"Evicted stream '{stream_id}'")
+
+        if len(evicted_streams) > 0:
+            self._save_file(STREAMS_FILE, json.dumps(self._streams_data, indent=4))
+
+        execution_time = time() - start_time
+
+        _LOGGER.info(
+            f"Evicted {len(evicted_streams):,} streams, "
+            f"Removed {removed_files:,} files and {removed_directories:,} directories, "
+            f"Duration: {execution_time:.3f} seconds"
+        )
+
+    def _build_files_index(self):
+        for stream_id in self._streams_data:
+            stream_info = self._streams_data[stream_id]
+            stream_status = stream_info.get(STREAM_STATUS, STREAM_STATUS_NEW)
+
+            if stream_status == STREAM_STATUS_EXISTS:
+                self._index_stream_files(stream_id, stream_info.get(STREAM_FILES))
+
+    def _index_stream_files(self, stream_id, stream_files):
+        file_paths = list(stream_files.values())
+
+        with self._files_lock:
+            for file_path in self._stream_files.get(stream_id, []):
+                self._files_index.get(file_path, set()).discard(stream_id)
+
+            self._stream_files[stream_id] = file_paths
+
+            for file_path in file_paths:
+                self._files_index.setdefault(file_path, set()).add(stream_id)
+
+    def _unindex_stream_files(self, stream_id) -> list[str]:
+        unreferenced_files = []
+
+        with self._files_lock:
+            for file_path in self._stream_files.pop(stream_id, []):
+                stream_ids = self._files_index.get(file_path, set())
+                stream_ids.discard(stream_id)
+
+                # TMDB file of a title is shared by all of its episodes
+                if len(stream_ids) == 0:
+                    self._files_index.pop(file_path, None)
+                    unreferenced_files.append(file_path)
+
+        return unreferenced_files
+
+    @staticmethod
+    def _remove_empty_directories(file_path) -> int:
+        removed_directories = 0
+        directory_path = os.path.dirname(file_path)
+
+        # Stop at the media type directory (media/tvshows, media/movies)
+        while len(directory_path.split("/")) > 2:
+            if not os.path.isdir(directory_path) or len(os.listdir(directory_path)) > 0:
+                break
+
+            os.rmdir(directory_path)
+            removed_directories += 1
+
+            directory_path = os.path.dirname(directory_path)
+
+        return removed_directories
+
     def _fault_report(self):
         for reported_stream_id in self._reported_as_fault:
             reported_stream_info = self._streams_data.get(reported_stream_id)
@@ -652,6 +1462,23 @@ class MediaSyncManager:
 
         return data
 
+    @staticmethod
+    def _is_upstream_failure(response) -> bool:
+        status_code = response.status_code
+
+        is_failure = (
+            status_code == HTTP_STATUS_TOO_MANY_REQUESTS
+            or status_code >= HTTP_STATUS_SERVER_ERROR
+        )
+
+        return is_failure
+
+    @staticmethod
+    def _is_upstream_error(ex) -> bool:
+        is_error = isinstance(ex, (requests.Timeout, requests.ConnectionError))
+
+        return is_error
+
     @staticmethod
     def _verify_url(line):
         match = re.compile("://").search(line)
@@ -684,11 +1511,111 @@ class MediaSyncManager:
 
                 self._has_cache = True
 
+    def _load_agtv_file(self):
+        # Last known lists, used for pages that fail to load before their deadline
+        if os.path.exists(AGTV_FILE):
+            with open(AGTV_FILE, encoding="UTF-8") as f:
+                self._agtv_data = json.loads(f.read())
+
     def _load_tmdb_file(self):
         if os.path.exists(TMDB_FILE):
             with open(TMDB_FILE, encoding="UTF-8") as f:
                 self._tmdb_data = json.loads(f.read())
 
+    def _load_journal_file(self):
+        if os.path.exists(JOURNAL_FILE):
+            endpoints = 0
+            stale_endpoints = 0
+            tmdb_items = 0
+            streams = 0
+
+            # Lists older than a scan interval may hold outdated URLs, load them again
+            max_endpoint_timestamp = time() - 60 * self._scan_interval
+
+            with open(JOURNAL_FILE, encoding="UTF-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+
+                    except ValueError:
+                        # Last entry may be partially written when the process was killed
+                        _LOGGER.warning("Skipping incomplete journal entry")
+
+                        continue
+
+                    entry_type = entry.get(JOURNAL_TYPE)
+                    key = entry.get(JOURNAL_KEY)
+                    data = entry.get(JOURNAL_DATA)
+
+                    if entry_type == JOURNAL_TYPE_ENDPOINT:
+                        timestamp = entry.get(JOURNAL_TIMESTAMP, 0)
+
+                        if timestamp < max_endpoint_timestamp:
+                            stale_endpoints += 1
+
+                            continue
+
+                        self._journal_endpoints[key] = data
+                        endpoints += 1
+
+                    elif entry_type == JOURNAL_TYPE_TMDB:
+                        self._tmdb_data[key] = data
+                        tmdb_items += 1
+
+                    elif entry_type == JOURNAL_TYPE_STREAM:
+                        self._streams_data[key] = data
+                        streams += 1
+
+            _LOGGER.info(
+                f"Resuming interrupted cycle, "
+                f"Endpoints: {endpoints}, Stale endpoints: {stale_endpoints}, "
+                f"TMDB items: {tmdb_items:,}, Stream files: {streams:,}"
+            )
+
+    def _open_journal(self):
+        self._prepare_directory(os.path.dirname(JOURNAL_FILE))
+
+        has_partial_entry = False
+
+        if os.path.exists(JOURNAL_FILE) and os.path.getsize(JOURNAL_FILE) > 0:
+            with open(JOURNAL_FILE, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+
+                has_partial_entry = f.read(1) != BREAK_LINE.encode()
+
+        with self._journal_lock:
+            self._journal = open(JOURNAL_FILE, "a", encoding="UTF-8")
+
+            # Terminate an entry cut by a restart, so new entries start on their own line
+            if has_partial_entry:
+                self._journal.write(BREAK_LINE)
+
+    def _write_journal(self, entry_type, key, data):
+        entry = {
+            JOURNAL_TYPE: entry_type,
+            JOURNAL_KEY: key,
+            JOURNAL_DATA: data,
+            JOURNAL_TIMESTAMP: time(),
+        }
+        line = f"{json.dumps(entry)}{BREAK_LINE}"
+
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.write(line)
+                self._journal.flush()
+
+    def _close_journal(self):
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+        # Cycle completed and its state is in the cache files, nothing to resume
+        self._journal_endpoints.clear()
+
+        if os.path.exists(JOURNAL_FILE):
+            os.remove(JOURNAL_FILE)
+
     @staticmethod
     def _prepare_directory(directory_path):
         if not os.path.exists(directory_path):
@@ -699,7 +1626,15 @@ class MediaSyncManager:
                 current_path = f"{current_path}/{directory_path_part}"
 
                 if not os.path.exists(current_path):
-                    os.mkdir(current_path)
+                    os.makedirs(current_path, exist_ok=True)
+
+    @staticmethod
+    def _remove_temp_files():
+        # Left behind when the process was killed between writing and replacing a file
+        for temp_directory_path in TEMP_DIRECTORIES:
+            if os.path.isdir(temp_directory_path):
+                for file_name in os.listdir(temp_directory_path):
+                    os.remove(f"{temp_directory_path}/{file_name}")
 
     def _save_file(self, file_path, content):
         file_path_parts = file_path.split("/")
@@ -707,9 +1642,18 @@ class MediaSyncManager:
 
         self._prepare_directory(directory_path)
 
-        with open(file_path, "w+", encoding="UTF-8") as f:
+        # Write to a temporary file and replace, a restart never leaves a partial file
+        temp_directory_path = f"{file_path_parts[0]}/{TEMP_DIRECTORY_NAME}"
+        temp_file_path = f"{temp_directory_path}/{threading.get_ident()}.tmp"
+
+        self._prepare_directory(temp_directory_path)
+
+        with open(temp_file_path, "w+", encoding="UTF-8") as f:
             f.write(content)
 
+        os.replace(temp_file_path, file_path)
+
 
-manager = MediaSyncManager()
-manager.initialize()
+if __name__ == "__main__":
+    manager = MediaSyncManager()
+    manager.initialize()
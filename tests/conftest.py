@@ -0,0 +1,168 @@
+import os
+import threading
+from time import sleep
+
+import pytest
+
+from consts import (
+    APOLLO_GROUP_TV_BASE_URL,
+    ENV_AGTV_PASSWORD,
+    ENV_AGTV_USERNAME,
+    ENV_TMDB_API_KEY,
+    TMDB_MEDIA_TYPE,
+    TMDB_MEDIA_TYPE_MOVIE,
+    TMDB_MEDIA_TYPE_TV_SHOW,
+)
+import entrypoint
+
+USERNAME = "user"
+PASSWORD = "pass"
+
+
+class StubResponse:
+    def __init__(self, status_code, text="", data=None):
+        self.status_code = status_code
+        self.text = text
+        self._data = data
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return self._data
+
+
+class StubUpstream:
+    def __init__(self):
+        self.pages = {}
+        self.tmdb = {}
+        self.latency = {}
+        self.failing = set()
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add_episode(self, endpoint, imdb_id, season, episode):
+        url = f"http://stream/{imdb_id}/{season}{episode}"
+        line = f'#EXTINF:-1 tvg-id="{imdb_id}" tvg-type="tvshows",{imdb_id} {season} {episode}'
+
+        self.pages.setdefault(endpoint, []).append((line, url))
+
+    def add_movie(self, endpoint, imdb_id):
+        url = f"http://stream/{imdb_id}"
+        line = f'#EXTINF:-1 tvg-id="{imdb_id}" tvg-type="movies",{imdb_id} Movie'
+
+        self.pages.setdefault(endpoint, []).append((line, url))
+
+    def remove_streams(self, imdb_id):
+        for endpoint in self.pages:
+            self.pages[endpoint] = [
+                item for item in self.pages[endpoint] if f'"{imdb_id}"' not in item[0]
+            ]
+
+    def add_show(self, imdb_id, name, first_air_date="2020-01-01"):
+        self.tmdb[imdb_id] = {
+            TMDB_MEDIA_TYPE: TMDB_MEDIA_TYPE_TV_SHOW,
+            "name": name,
+            "first_air_date": first_air_date,
+        }
+
+    def add_film(self, imdb_id, title, release_date="2020-01-01"):
+        self.tmdb[imdb_id] = {
+            TMDB_MEDIA_TYPE: TMDB_MEDIA_TYPE_MOVIE,
+            "title": title,
+            "release_date": release_date,
+        }
+
+    def get(self, url, headers=None, timeout=None):
+        with self._lock:
+            self.calls.append(url)
+
+        if url.startswith("https://api.themoviedb.org"):
+            imdb_id = url.split("/find/")[1].split("?")[0]
+            tmdb_info = self.tmdb.get(imdb_id)
+            data = {}
+
+            if tmdb_info is not None:
+                media_type = tmdb_info[TMDB_MEDIA_TYPE]
+                data[f"{media_type}_results"] = [tmdb_info]
+
+            return StubResponse(200, data=data)
+
+        endpoint = url.replace(f"{APOLLO_GROUP_TV_BASE_URL}/{USERNAME}/{PASSWORD}/", "")
+
+        with self._lock:
+            latency = self.latency.get(endpoint, 0)
+
+            # A list of latencies is consumed one request at a time
+            if isinstance(latency, list):
+                latency = latency.pop(0) if len(latency) > 0 else 0
+
+        sleep(latency)
+
+        if endpoint in self.failing:
+            return StubResponse(503)
+
+        lines = ["#EXTM3U"]
+
+        for line, stream_url in self.pages.get(endpoint, []):
+            lines.extend([line, stream_url])
+
+        return StubResponse(200, text="\n".join(lines))
+
+    def count_calls(self, prefix) -> int:
+        with self._lock:
+            return len([url for url in self.calls if url.startswith(prefix)])
+
+
+@pytest.fixture(autouse=True)
+def workdir(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+    return tmp_path
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    stub = StubUpstream()
+
+    monkeypatch.setattr(entrypoint.requests, "get", stub.get)
+
+    return stub
+
+
+@pytest.fixture
+def create_manager(monkeypatch, upstream):
+    monkeypatch.setenv(ENV_AGTV_USERNAME, USERNAME)
+    monkeypatch.setenv(ENV_AGTV_PASSWORD, PASSWORD)
+    monkeypatch.setenv(ENV_TMDB_API_KEY, "key")
+
+    def _create_manager(**environment):
+        for key in environment:
+            monkeypatch.setenv(key, str(environment[key]))
+
+        manager = entrypoint.MediaSyncManager()
+        manager._load_cache()
+        manager._endpoints = list(upstream.pages)
+
+        return manager
+
+    return _create_manager
+
+
+def read_tree(directory) -> dict:
+    tree = {}
+
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+
+            with open(file_path, encoding="UTF-8") as f:
+                tree[os.path.relpath(file_path, directory)] = f.read()
+
+    return tree
+
+
+@pytest.fixture
+def media_tree():
+    return read_tree
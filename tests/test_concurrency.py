@@ -0,0 +1,147 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import random
+import threading
+from time import sleep
+
+import pytest
+import requests
+
+from concurrency import AdaptiveConcurrencyLimiter
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+        # Path is /<status code>/<latency in milliseconds>
+        _, status_code, latency = self.path.split("/")
+
+        sleep(int(latency) / 1000)
+
+        with server.lock:
+            server.in_flight -= 1
+
+        self.send_response(int(status_code))
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+
+    thread = threading.Thread(target=server.serve_forever, args=[0.05], daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _request(stub_server, limiter, status_code=200, latency=0):
+    host, port = stub_server.server_address
+    url = f"http://{host}:{port}/{status_code}/{latency}"
+
+    start_time = limiter.acquire()
+    failed = False
+
+    try:
+        response = requests.get(url, timeout=5)
+        failed = response.status_code == 429 or response.status_code >= 500
+
+    except requests.RequestException:
+        failed = True
+
+    limiter.release(start_time, failed)
+
+
+def _run_concurrently(workers, target):
+    threads = [threading.Thread(target=target) for _ in range(0, workers)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+
+def test_limit_grows_while_healthy(stub_server):
+    limiter = AdaptiveConcurrencyLimiter("stub", 2, 1, 6, 1)
+
+    def work():
+        for _ in range(0, 20):
+            _request(stub_server, limiter, latency=10)
+
+    _run_concurrently(10, work)
+
+    assert limiter.limit == 6
+    assert stub_server.max_in_flight <= 6
+    assert limiter.metrics["successes"] == 200
+    assert limiter.metrics["failures"] == 0
+
+
+@pytest.mark.parametrize("status_code", [429, 500, 503])
+def test_limit_halves_on_failed_response(stub_server, status_code):
+    limiter = AdaptiveConcurrencyLimiter("stub", 8, 1, 50, 1)
+
+    _request(stub_server, limiter, status_code=status_code)
+
+    assert limiter.limit == 4
+
+    _request(stub_server, limiter, status_code=status_code)
+
+    assert limiter.limit == 2
+    assert limiter.metrics["failures"] == 2
+
+
+def test_limit_halves_on_slow_response(stub_server):
+    limiter = AdaptiveConcurrencyLimiter("stub", 8, 1, 50, 0.1)
+
+    _request(stub_server, limiter, latency=200)
+
+    assert limiter.limit == 4
+    assert limiter.metrics["failures"] == 0
+
+
+def test_in_flight_failures_halve_once(stub_server):
+    limiter = AdaptiveConcurrencyLimiter("stub", 8, 1, 50, 1)
+
+    _run_concurrently(
+        8, lambda: _request(stub_server, limiter, status_code=503, latency=100)
+    )
+
+    assert limiter.limit == 4
+
+
+def test_limit_stays_within_bounds(stub_server):
+    assert AdaptiveConcurrencyLimiter("stub", 100, 2, 8, 1).limit == 8
+    assert AdaptiveConcurrencyLimiter("stub", 0, 2, 8, 1).limit == 2
+
+    limiter = AdaptiveConcurrencyLimiter("stub", 4, 2, 8, 0.05)
+    limits = []
+    outcomes = [(200, 0), (200, 5), (200, 80), (429, 0), (503, 20)]
+
+    def work():
+        for _ in range(0, 15):
+            status_code, latency = random.choice(outcomes)
+
+            _request(stub_server, limiter, status_code, latency)
+
+            limits.append(limiter.limit)
+
+    _run_concurrently(12, work)
+
+    assert min(limits) >= 2
+    assert max(limits) <= 8
+    assert stub_server.max_in_flight <= 8
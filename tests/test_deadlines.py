@@ -0,0 +1,84 @@
+import pytest
+
+import entrypoint
+
+AGTV_PREFIX = "https://starlite.best"
+
+
+@pytest.fixture
+def deadlines(monkeypatch):
+    monkeypatch.setattr(entrypoint, "AGTV_HEDGE_DEFAULT_DELAY", 0.3)
+    monkeypatch.setattr(entrypoint, "AGTV_HEDGE_MIN_DELAY", 0.3)
+    monkeypatch.setattr(entrypoint, "AGTV_PAGE_DEADLINE", 0.6)
+    monkeypatch.setattr(entrypoint, "AGTV_STAGE_DEADLINE", 10)
+
+
+def _prepare_pages(upstream, pages):
+    for page in range(1, pages + 1):
+        imdb_id = f"tt{page}"
+
+        upstream.add_show(imdb_id, f"Show {imdb_id}")
+        upstream.add_episode(f"m3u8/tvshows/{page}", imdb_id, "S01", "E01")
+
+
+def test_queued_pages_are_not_hedged(deadlines, upstream, create_manager):
+    _prepare_pages(upstream, 26)
+
+    for endpoint in upstream.pages:
+        upstream.latency[endpoint] = 0.2
+
+    manager = create_manager()
+    manager._load_agtv_data()
+
+    assert upstream.count_calls(AGTV_PREFIX) == 26
+    assert len(manager._agtv_data) == 26
+    assert manager._stale_endpoints == []
+    assert manager._missing_endpoints == []
+    assert max(manager._agtv_latencies) < 0.3
+
+
+def test_slow_page_is_hedged(deadlines, upstream, create_manager):
+    _prepare_pages(upstream, 2)
+
+    upstream.latency["m3u8/tvshows/1"] = [2, 0]
+
+    manager = create_manager()
+    manager._load_agtv_data()
+
+    assert upstream.count_calls(AGTV_PREFIX) == 3
+    assert len(manager._agtv_data["m3u8/tvshows/1"]) == 3
+    assert manager._stale_endpoints == []
+
+
+def test_page_missing_deadline_keeps_last_known_data(
+    deadlines, upstream, create_manager
+):
+    _prepare_pages(upstream, 2)
+
+    manager = create_manager()
+    manager._process()
+
+    stream_ids = set(manager._streams_data)
+    last_known_lines = manager._agtv_data["m3u8/tvshows/2"]
+
+    upstream.latency["m3u8/tvshows/2"] = 2
+    upstream.remove_streams("tt2")
+
+    manager._process()
+
+    assert manager._stale_endpoints == ["m3u8/tvshows/2"]
+    assert manager._agtv_data["m3u8/tvshows/2"] == last_known_lines
+    assert set(manager._streams_data) == stream_ids
+    assert manager._seen_streams == stream_ids
+
+
+def test_page_without_data_is_missing(deadlines, upstream, create_manager):
+    _prepare_pages(upstream, 2)
+
+    upstream.failing.add("m3u8/tvshows/2")
+
+    manager = create_manager()
+    manager._load_agtv_data()
+
+    assert manager._missing_endpoints == ["m3u8/tvshows/2"]
+    assert "m3u8/tvshows/2" not in manager._agtv_data
@@ -0,0 +1,149 @@
+import json
+import os
+from time import time
+
+from consts import (
+    BREAK_LINE,
+    JOURNAL_DATA,
+    JOURNAL_FILE,
+    JOURNAL_KEY,
+    JOURNAL_TIMESTAMP,
+    JOURNAL_TYPE,
+    JOURNAL_TYPE_ENDPOINT,
+    JOURNAL_TYPE_TMDB,
+    STREAM_FILE_MEDIA_PATH,
+    STREAM_FILES,
+    STREAM_STATUS,
+    STREAM_STATUS_EXISTS,
+    TEMP_DIRECTORIES,
+)
+
+AGTV_PREFIX = "https://starlite.best"
+TMDB_PREFIX = "https://api.themoviedb.org"
+
+
+def _prepare_upstream(upstream):
+    for show in range(0, 3):
+        imdb_id = f"tt{show}"
+        upstream.add_show(imdb_id, f"Show {imdb_id}")
+
+        for episode in range(1, 5):
+            upstream.add_episode(
+                f"m3u8/tvshows/{show + 1}", imdb_id, "S01", f"E{episode:02d}"
+            )
+
+
+def _write_entries(entries):
+    os.makedirs(os.path.dirname(JOURNAL_FILE), exist_ok=True)
+
+    with open(JOURNAL_FILE, "w", encoding="UTF-8") as f:
+        f.write(entries)
+
+
+def _entry(entry_type, key, data, timestamp=None):
+    entry = {
+        JOURNAL_TYPE: entry_type,
+        JOURNAL_KEY: key,
+        JOURNAL_DATA: data,
+        JOURNAL_TIMESTAMP: time() if timestamp is None else timestamp,
+    }
+
+    return f"{json.dumps(entry)}{BREAK_LINE}"
+
+
+def test_interrupted_cycle_resumes(upstream, create_manager):
+    _prepare_upstream(upstream)
+
+    manager = create_manager()
+    manager._open_journal()
+    manager._load_agtv_data()
+    manager._extract_streams()
+    manager._load_tmdb_data()
+    manager._merge_tmdb_into_streams()
+
+    written_streams = sorted(manager._streams_data)[:5]
+
+    for stream_id in written_streams:
+        manager._update_stream_file(stream_id)
+
+    # Process stops before the cycle completes, the journal is left behind
+    manager._journal.close()
+
+    agtv_calls = upstream.count_calls(AGTV_PREFIX)
+    tmdb_calls = upstream.count_calls(TMDB_PREFIX)
+
+    resumed_manager = create_manager()
+
+    for stream_id in written_streams:
+        stream_info = resumed_manager._streams_data[stream_id]
+
+        assert stream_info[STREAM_STATUS] == STREAM_STATUS_EXISTS
+
+    resumed_manager._process()
+
+    assert upstream.count_calls(AGTV_PREFIX) == agtv_calls
+    assert upstream.count_calls(TMDB_PREFIX) == tmdb_calls
+    assert not os.path.exists(JOURNAL_FILE)
+
+    for stream_info in resumed_manager._streams_data.values():
+        assert stream_info[STREAM_STATUS] == STREAM_STATUS_EXISTS
+        assert os.path.exists(stream_info[STREAM_FILES][STREAM_FILE_MEDIA_PATH])
+
+
+def test_partial_entry_is_terminated(upstream, create_manager):
+    complete_entry = _entry(JOURNAL_TYPE_TMDB, "tt1", {"name": "One"})
+    _write_entries(f'{complete_entry}{{"type": "tm')
+
+    manager = create_manager()
+    manager._open_journal()
+    manager._write_journal(JOURNAL_TYPE_TMDB, "tt2", {"name": "Two"})
+    manager._journal.close()
+
+    resumed_manager = create_manager()
+
+    assert resumed_manager._tmdb_data == {
+        "tt1": {"name": "One"},
+        "tt2": {"name": "Two"},
+    }
+
+
+def test_stale_lists_are_ignored(upstream, create_manager):
+    stale_timestamp = time() - 2 * 60 * 60
+
+    _write_entries(
+        _entry(JOURNAL_TYPE_ENDPOINT, "m3u8/movies", ["#EXTM3U"], stale_timestamp)
+        + _entry(JOURNAL_TYPE_ENDPOINT, "m3u8/tvshows/1", ["#EXTM3U"])
+        + _entry(JOURNAL_TYPE_TMDB, "tt1", {"name": "One"}, stale_timestamp)
+    )
+
+    manager = create_manager(SCAN_INTERVAL=60)
+
+    assert list(manager._journal_endpoints) == ["m3u8/tvshows/1"]
+    assert manager._tmdb_data == {"tt1": {"name": "One"}}
+
+
+def test_temp_files_are_not_left_in_media(upstream, create_manager):
+    _prepare_upstream(upstream)
+
+    manager = create_manager()
+    manager._process()
+
+    for root, _, files in os.walk("media"):
+        for file_name in files:
+            assert not file_name.endswith(".tmp")
+
+    for temp_directory_path in TEMP_DIRECTORIES:
+        assert os.listdir(temp_directory_path) == []
+
+
+def test_stale_temp_files_are_removed(upstream, create_manager):
+    for temp_directory_path in TEMP_DIRECTORIES:
+        os.makedirs(temp_directory_path)
+
+        with open(f"{temp_directory_path}/1.tmp", "w", encoding="UTF-8") as f:
+            f.write("partial")
+
+    create_manager()
+
+    for temp_directory_path in TEMP_DIRECTORIES:
+        assert os.listdir(temp_directory_path) == []
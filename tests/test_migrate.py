@@ -0,0 +1,154 @@
+import logging
+import os
+
+from consts import (
+    STREAM_FILE_MEDIA_PATH,
+    STREAM_FILE_TMDB,
+    STREAM_FILES,
+    STREAM_STATUS,
+    STREAM_STATUS_EXISTS,
+    TMDB_FILE,
+)
+import entrypoint
+
+ALPHA = "media/tvshows/Alpha (2020)"
+ALPHA_TWO = "media/tvshows/Alpha Two (2020)"
+
+
+def _get_stream_info(manager, imdb_id, season, episode):
+    return manager._streams_data[f"{imdb_id}_{season}_{episode}"]
+
+
+def _assert_recorded_files_exist(manager):
+    for stream_info in manager._streams_data.values():
+        assert stream_info[STREAM_STATUS] == STREAM_STATUS_EXISTS
+
+        for file_path in stream_info[STREAM_FILES].values():
+            assert os.path.exists(file_path)
+
+
+def test_title_directory_is_moved(upstream, create_manager, media_tree):
+    upstream.add_show("tt1", "Alpha")
+    upstream.add_episode("m3u8/tvshows/1", "tt1", "S01", "E01")
+    upstream.add_episode("m3u8/tvshows/1", "tt1", "S01", "E02")
+
+    manager = create_manager()
+    manager._process()
+
+    media_path = f"{ALPHA}/Alpha (2020) - Season 01/Alpha (2020) - S01E01.strm"
+    inode = os.stat(media_path).st_ino
+
+    manager._tmdb_data["tt1"]["name"] = "Alpha Two"
+    manager._process()
+
+    assert not os.path.exists(ALPHA)
+    assert sorted(media_tree(ALPHA_TWO)) == [
+        "Alpha Two (2020) - Season 01/Alpha Two (2020) - S01E01.strm",
+        "Alpha Two (2020) - Season 01/Alpha Two (2020) - S01E02.strm",
+        "Alpha Two (2020).json",
+    ]
+
+    stream_info = _get_stream_info(manager, "tt1", "S01", "E01")
+    stream_files = stream_info[STREAM_FILES]
+
+    assert os.stat(stream_files[STREAM_FILE_MEDIA_PATH]).st_ino == inode
+    assert stream_files[STREAM_FILE_TMDB] == f"{ALPHA_TWO}/Alpha Two (2020).json"
+
+    _assert_recorded_files_exist(manager)
+
+
+def test_shared_title_directory_is_not_moved(
+    caplog, upstream, create_manager, media_tree
+):
+    upstream.add_show("tt1", "Alpha")
+    upstream.add_show("tt3", "Alpha")
+    upstream.add_episode("m3u8/tvshows/1", "tt1", "S01", "E01")
+    upstream.add_episode("m3u8/tvshows/1", "tt3", "S02", "E01")
+
+    manager = create_manager()
+    manager._process()
+
+    manager._tmdb_data["tt1"]["name"] = "Alpha Two"
+
+    with caplog.at_level(logging.INFO):
+        manager._process()
+
+    assert (
+        f"Migrated files of title '{ALPHA}' to '{ALPHA_TWO}', Streams: 1, Renamed: 1, Copied: 1"
+        in caplog.messages
+    )
+    assert sorted(media_tree(ALPHA)) == [
+        "Alpha (2020) - Season 02/Alpha (2020) - S02E01.strm",
+        "Alpha (2020).json",
+    ]
+    assert sorted(media_tree(ALPHA_TWO)) == [
+        "Alpha Two (2020) - Season 01/Alpha Two (2020) - S01E01.strm",
+        "Alpha Two (2020).json",
+    ]
+
+    _assert_recorded_files_exist(manager)
+
+
+def test_naming_rule_change_is_migrated(
+    monkeypatch, upstream, create_manager, media_tree
+):
+    upstream.add_film("tt5", "Gamma: Delta")
+    upstream.add_movie("m3u8/movies", "tt5")
+
+    manager = create_manager()
+    manager._process()
+
+    assert os.path.isdir("media/movies/Gamma Delta (2020)")
+
+    clean_chars = dict(entrypoint.CLEAN_CHARS)
+    clean_chars[":"] = " -"
+    monkeypatch.setattr(entrypoint, "CLEAN_CHARS", clean_chars)
+
+    manager._process()
+
+    assert not os.path.exists("media/movies/Gamma Delta (2020)")
+    assert sorted(media_tree("media/movies/Gamma - Delta (2020)")) == [
+        "Gamma - Delta (2020).json",
+        "Gamma - Delta (2020).strm",
+    ]
+
+    _assert_recorded_files_exist(manager)
+
+
+def test_missing_file_is_written(upstream, create_manager):
+    upstream.add_show("tt1", "Alpha")
+    upstream.add_episode("m3u8/tvshows/1", "tt1", "S01", "E01")
+
+    manager = create_manager()
+    manager._process()
+
+    stream_info = _get_stream_info(manager, "tt1", "S01", "E01")
+    os.remove(stream_info[STREAM_FILES][STREAM_FILE_MEDIA_PATH])
+
+    manager._tmdb_data["tt1"]["name"] = "Alpha Two"
+    manager._process()
+
+    _assert_recorded_files_exist(manager)
+
+
+def test_removed_tmdb_cache_is_migrated(upstream, create_manager):
+    upstream.add_show("tt1", "Alpha")
+    upstream.add_episode("m3u8/tvshows/1", "tt1", "S01", "E01")
+
+    manager = create_manager()
+    manager._process()
+
+    upstream.add_show("tt1", "Alpha Two")
+    os.remove(TMDB_FILE)
+
+    restarted_manager = create_manager()
+    restarted_manager._process()
+
+    assert os.path.isdir(ALPHA)
+
+    restarted_manager._process()
+
+    assert not os.path.exists(ALPHA)
+    assert os.path.isdir(ALPHA_TWO)
+
+    _assert_recorded_files_exist(restarted_manager)
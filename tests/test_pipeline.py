@@ -0,0 +1,68 @@
+from consts import (
+    ENV_PIPELINE_MODE,
+    PIPELINE_STAGE_FETCH,
+    PIPELINE_STAGE_FINALIZE,
+    PIPELINE_STAGE_TMDB,
+    STREAM_STATUS,
+    STREAM_STATUS_EXISTS,
+)
+
+
+def _prepare_upstream(upstream):
+    for page in range(1, 4):
+        endpoint = f"m3u8/tvshows/{page}"
+
+        for show in range(0, 3):
+            imdb_id = f"tt{page}{show}"
+            upstream.add_show(imdb_id, f"Show {imdb_id}")
+
+            for episode in range(1, 4):
+                upstream.add_episode(endpoint, imdb_id, "S01", f"E{episode:02d}")
+
+    upstream.add_film("tt900", "Film: One")
+    upstream.add_movie("m3u8/movies", "tt900")
+
+
+def test_pipeline_matches_sequential(
+    monkeypatch, workdir, upstream, create_manager, media_tree
+):
+    _prepare_upstream(upstream)
+
+    results = {}
+
+    for pipeline_mode in [False, True]:
+        directory = workdir / str(pipeline_mode)
+        directory.mkdir()
+        monkeypatch.chdir(directory)
+
+        manager = create_manager(**{ENV_PIPELINE_MODE: pipeline_mode})
+        manager._process()
+
+        results[pipeline_mode] = (
+            media_tree(directory / "media"),
+            manager._streams_data,
+        )
+
+    sequential_tree, sequential_streams = results[False]
+    pipeline_tree, pipeline_streams = results[True]
+
+    assert len(sequential_tree) == 9 * 3 + 9 + 2
+    assert pipeline_tree == sequential_tree
+    assert pipeline_streams == sequential_streams
+    assert {
+        stream_info[STREAM_STATUS] for stream_info in pipeline_streams.values()
+    } == {STREAM_STATUS_EXISTS}
+
+
+def test_pipeline_reports_stage_items(upstream, create_manager):
+    _prepare_upstream(upstream)
+
+    manager = create_manager(**{ENV_PIPELINE_MODE: True})
+    manager._process()
+
+    stats = manager._pipeline_stats
+
+    assert stats[PIPELINE_STAGE_FETCH]["items"] == 4
+    assert stats[PIPELINE_STAGE_TMDB]["items"] == 10
+    assert stats[PIPELINE_STAGE_FINALIZE]["items"] == 28
+    assert stats[PIPELINE_STAGE_FINALIZE]["finished"] >= 0
@@ -0,0 +1,143 @@
+import os
+
+import pytest
+
+from consts import ENV_EVICTION_CYCLES, ENV_PIPELINE_MODE, STREAM_MISSED_CYCLES
+import entrypoint
+
+TITLE_ONE = "media/tvshows/Alpha (2020)"
+TITLE_TWO = "media/tvshows/Beta (2020)"
+
+
+def _prepare_upstream(upstream):
+    upstream.add_show("tt1", "Alpha")
+    upstream.add_show("tt2", "Beta")
+
+    upstream.add_episode("m3u8/tvshows/1", "tt1", "S01", "E01")
+    upstream.add_episode("m3u8/tvshows/1", "tt1", "S02", "E01")
+    upstream.add_episode("m3u8/tvshows/1", "tt2", "S01", "E01")
+    upstream.add_episode("m3u8/tvshows/2", "tt2", "S01", "E02")
+
+
+def _get_stream_ids(manager, imdb_id):
+    return [
+        stream_id
+        for stream_id in manager._streams_data
+        if stream_id.startswith(f"{imdb_id}_")
+    ]
+
+
+def test_unseen_streams_are_evicted(upstream, create_manager, media_tree):
+    _prepare_upstream(upstream)
+
+    manager = create_manager(**{ENV_EVICTION_CYCLES: 2})
+    manager._process()
+
+    assert os.path.isdir(TITLE_ONE)
+
+    upstream.remove_streams("tt1")
+
+    manager._process()
+
+    for stream_id in _get_stream_ids(manager, "tt1"):
+        assert manager._streams_data[stream_id][STREAM_MISSED_CYCLES] == 1
+
+    assert os.path.isdir(TITLE_ONE)
+
+    manager._process()
+
+    assert _get_stream_ids(manager, "tt1") == []
+    assert not os.path.exists(TITLE_ONE)
+    assert len(media_tree(TITLE_TWO)) == 3
+    assert not any(path.startswith(TITLE_ONE) for path in manager._files_index)
+
+
+def test_shared_files_are_kept(upstream, create_manager, media_tree):
+    _prepare_upstream(upstream)
+
+    manager = create_manager(**{ENV_EVICTION_CYCLES: 1})
+    manager._process()
+
+    upstream.pages["m3u8/tvshows/1"] = [
+        item for item in upstream.pages["m3u8/tvshows/1"] if "S02" not in item[0]
+    ]
+
+    manager._process()
+
+    assert sorted(media_tree(TITLE_ONE)) == [
+        "Alpha (2020) - Season 01/Alpha (2020) - S01E01.strm",
+        "Alpha (2020).json",
+    ]
+
+
+def test_returning_stream_is_kept(upstream, create_manager):
+    _prepare_upstream(upstream)
+
+    manager = create_manager(**{ENV_EVICTION_CYCLES: 2})
+    manager._process()
+
+    removed_pages = dict(upstream.pages)
+    upstream.remove_streams("tt1")
+
+    manager._process()
+
+    upstream.pages = removed_pages
+
+    manager._process()
+    manager._process()
+
+    for stream_id in _get_stream_ids(manager, "tt1"):
+        assert STREAM_MISSED_CYCLES not in manager._streams_data[stream_id]
+
+    assert len(_get_stream_ids(manager, "tt1")) == 2
+
+
+def test_missing_list_skips_reconciliation(monkeypatch, upstream, create_manager):
+    monkeypatch.setattr(entrypoint, "AGTV_HEDGE_DEFAULT_DELAY", 0.1)
+
+    _prepare_upstream(upstream)
+
+    upstream.failing.add("m3u8/tvshows/2")
+
+    manager = create_manager(**{ENV_EVICTION_CYCLES: 1})
+    manager._process()
+    manager._process()
+
+    for stream_info in manager._streams_data.values():
+        assert STREAM_MISSED_CYCLES not in stream_info
+
+
+def test_files_index_is_loaded_from_cache(upstream, create_manager):
+    _prepare_upstream(upstream)
+
+    manager = create_manager(**{ENV_EVICTION_CYCLES: 1})
+    manager._process()
+
+    upstream.remove_streams("tt1")
+
+    restarted_manager = create_manager(**{ENV_EVICTION_CYCLES: 1})
+    restarted_manager._process()
+
+    assert _get_stream_ids(restarted_manager, "tt1") == []
+    assert not os.path.exists(TITLE_ONE)
+    assert os.path.isdir(TITLE_TWO)
+
+
+@pytest.mark.parametrize("pipeline_mode", [False, True])
+def test_dropped_endpoint_streams_are_evicted(upstream, create_manager, pipeline_mode):
+    _prepare_upstream(upstream)
+
+    environment = {ENV_EVICTION_CYCLES: 1, ENV_PIPELINE_MODE: pipeline_mode}
+
+    manager = create_manager(**environment)
+    manager._process()
+
+    assert "tt2_S01_E02" in manager._streams_data
+
+    restarted_manager = create_manager(**environment)
+    restarted_manager._endpoints = ["m3u8/tvshows/1"]
+    restarted_manager._process()
+
+    assert list(restarted_manager._agtv_data) == ["m3u8/tvshows/1"]
+    assert "tt2_S01_E02" not in restarted_manager._streams_data
+    assert "tt2_S01_E01" in restarted_manager._streams_data
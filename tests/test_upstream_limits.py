@@ -0,0 +1,129 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+from time import sleep, time
+
+import pytest
+
+from consts import (
+    ENV_AGTV_PASSWORD,
+    ENV_AGTV_USERNAME,
+    ENV_TMDB_API_KEY,
+    MAX_THREADS_IO,
+)
+import entrypoint
+
+ENDPOINT = "m3u8/tvshows/1"
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+
+        sleep(server.latency)
+
+        self.send_response(server.status_code)
+        self.end_headers()
+
+        if server.status_code == 200:
+            body = "{}" if "/find/" in self.path else "#EXTM3U"
+
+            self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UpstreamHandler)
+    server.daemon_threads = True
+    server.status_code = 200
+    server.latency = 0
+
+    thread = threading.Thread(target=server.serve_forever, args=[0.05], daemon=True)
+    thread.start()
+
+    host, port = server.server_address
+
+    monkeypatch.setattr(entrypoint, "APOLLO_GROUP_TV_BASE_URL", f"http://{host}:{port}")
+    monkeypatch.setattr(entrypoint, "TMDB_BASE_URL", f"http://{host}:{port}/3")
+    monkeypatch.setattr(entrypoint, "TMDB_REQUEST_TIMEOUT", 0.2)
+    monkeypatch.setattr(entrypoint, "AGTV_REQUEST_TIMEOUT", 0.2)
+    monkeypatch.setattr(entrypoint, "AGTV_PAGE_DEADLINE", 0.5)
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def manager(monkeypatch, upstream_server):
+    monkeypatch.setenv(ENV_AGTV_USERNAME, "user")
+    monkeypatch.setenv(ENV_AGTV_PASSWORD, "pass")
+    monkeypatch.setenv(ENV_TMDB_API_KEY, "key")
+
+    return entrypoint.MediaSyncManager()
+
+
+def _load_tmdb(manager):
+    manager._load_tmdb_media_data("tt1")
+
+
+def _load_agtv(manager):
+    manager._load_endpoint_data(ENDPOINT, time() + 5)
+
+
+@pytest.mark.parametrize(
+    "load, limiter_name",
+    [(_load_tmdb, "_limiter_tmdb"), (_load_agtv, "_limiter_agtv")],
+)
+def test_limit_grows_while_healthy(manager, load, limiter_name):
+    limiter = getattr(manager, limiter_name)
+
+    for _ in range(0, 25):
+        load(manager)
+
+    assert limiter.limit == MAX_THREADS_IO + 2
+    assert limiter.metrics["failures"] == 0
+
+
+@pytest.mark.parametrize(
+    "load, limiter_name",
+    [(_load_tmdb, "_limiter_tmdb"), (_load_agtv, "_limiter_agtv")],
+)
+@pytest.mark.parametrize("status_code", [429, 500, 503])
+def test_limit_shrinks_on_failed_response(
+    manager, upstream_server, load, limiter_name, status_code
+):
+    limiter = getattr(manager, limiter_name)
+    upstream_server.status_code = status_code
+
+    load(manager)
+
+    assert limiter.limit == MAX_THREADS_IO // 2
+    assert limiter.metrics["failures"] >= 1
+
+
+@pytest.mark.parametrize(
+    "load, limiter_name",
+    [(_load_tmdb, "_limiter_tmdb"), (_load_agtv, "_limiter_agtv")],
+)
+def test_limit_shrinks_on_timeout(manager, upstream_server, load, limiter_name):
+    limiter = getattr(manager, limiter_name)
+    upstream_server.latency = 0.4
+
+    load(manager)
+
+    assert limiter.limit == MAX_THREADS_IO // 2
+    assert limiter.metrics["failures"] >= 1
+
+
+def test_client_error_is_not_an_upstream_failure(manager, upstream_server):
+    upstream_server.status_code = 404
+
+    _load_tmdb(manager)
+    _load_agtv(manager)
+
+    assert manager._limiter_tmdb.metrics["failures"] == 0
+    assert manager._limiter_agtv.metrics["failures"] == 0